@@ -3,15 +3,25 @@
 Alpha Vantage Service - Fetch financial data using Alpha Vantage API
 """
 
+import asyncio
+import functools
 import logging
+import random
+import threading
 import time
+import httpx
+import orjson
 import requests
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any, Tuple, List, Optional
+import numpy as np
 import pandas as pd
 import os
 import streamlit as st
 
+from redis_cache_service import get_redis_cache_service
+
 # ---------- LOGGING ----------
 logging.basicConfig(
     level=logging.INFO,
@@ -19,6 +29,74 @@ logging.basicConfig(
     datefmt="%H:%M:%S",
 )
 
+# Ticker normalization mapping for Alpha Vantage API - module-level so the
+# memoized normalizer doesn't key on the service instance
+TICKER_MAPPING = {
+    # Berkshire Hathaway variations - Alpha Vantage uses hyphens, not dots
+    'BRKB': 'BRK-B',
+    'BRKA': 'BRK-A',
+    'BRK': 'BRK-B',  # Default to B shares
+    'BRK.B': 'BRK-B',  # Convert dots to hyphens
+    'BRK.A': 'BRK-A',  # Convert dots to hyphens
+
+    # Google variations
+    'GOOG': 'GOOGL',
+    'GOOGL': 'GOOGL',
+
+    # Other common variations
+    'VIX': '^VIX',  # VIX index
+    'SPY': 'SPY',
+    'QQQ': 'QQQ',
+    'IWM': 'IWM',
+
+    # Add more mappings as needed
+}
+
+# Static variation rules keyed by suffix pattern - classified once per call
+# instead of re-branching on string predicates inline
+_VARIATION_RULES = {
+    ('len4', 'endsB'): lambda t: [t[:-1] + '.' + t[-1]],  # e.g. BRKB -> BRK.B
+}
+
+
+def _classify_ticker(ticker: str) -> Optional[Tuple[str, str]]:
+    """Map a ticker to its variation-rule key, or None if no rule applies."""
+    if len(ticker) == 4 and ticker.endswith('B'):
+        return ('len4', 'endsB')
+    return None
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter. Tokens refill continuously at
+    `rate` per second up to `capacity`, so idle periods build burst credit
+    instead of forcing a fixed gap between every call.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _update(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.last_update = now
+
+    def acquire(self, tokens: float = 1):
+        """Block until the requested tokens are available, then consume them."""
+        with self._lock:
+            self._update()
+            if self.tokens < tokens:
+                wait_time = (tokens - self.tokens) / self.rate
+                logging.info(f"Rate limit reached. Sleeping for {wait_time:.1f} seconds...")
+                time.sleep(wait_time)
+                self._update()
+            self.tokens -= tokens
+
+
 class AlphaVantageService:
     """
     Service for fetching stock data using Alpha Vantage API.
@@ -34,128 +112,268 @@ class AlphaVantageService:
         self.base_url = "https://www.alphavantage.co/query"
         self.quota_limit = 500  # Premium tier limit
         self.calls_per_minute = 5  # 5 requests per minute
-        self.last_call_time = 0
-        self.call_count = 0
-        self.last_reset_time = time.time()
-        
-        # Cache for current prices and historical data
-        self.price_cache = {}
-        self.historical_cache = {}
-        self.cache_duration = 300  # 5 minutes
-        
-        # Ticker normalization mapping for Alpha Vantage API
-        self.ticker_mapping = {
-            # Berkshire Hathaway variations - Alpha Vantage uses hyphens, not dots
-            'BRKB': 'BRK-B',
-            'BRKA': 'BRK-A',
-            'BRK': 'BRK-B',  # Default to B shares
-            'BRK.B': 'BRK-B',  # Convert dots to hyphens
-            'BRK.A': 'BRK-A',  # Convert dots to hyphens
-            
-            # Google variations
-            'GOOG': 'GOOGL',
-            'GOOGL': 'GOOGL',
-            
-            # Other common variations
-            'VIX': '^VIX',  # VIX index
-            'SPY': 'SPY',
-            'QQQ': 'QQQ',
-            'IWM': 'IWM',
-            
-            # Add more mappings as needed
-        }
+
+        # Shared session with connection pooling - reuses TCP/TLS connections
+        # instead of paying a fresh handshake on every request
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+
+        # Token bucket allows bursts up to the full per-minute budget and
+        # serializes concurrent callers correctly
+        self._bucket = TokenBucket(rate=self.calls_per_minute / 60, capacity=self.calls_per_minute)
+        self.max_workers = 5  # Matches calls_per_minute so in-flight requests stay within quota
+        
+        # Shared cache for current prices and historical data - Redis-backed
+        # when REDIS_URL is set, in-memory otherwise (TTLs live in the service)
+        self.cache = get_redis_cache_service()
+        
+        # Remembers which variation resolved for a ticker so repeat lookups
+        # skip the rate-limited variation probes entirely
+        self._resolved_symbol: Dict[str, str] = {}
+
+        # Remembers when a ticker failed every variation so bad symbols do
+        # not re-run the whole probe cascade on each call
+        self._negative_cache: Dict[str, float] = {}
+        self.negative_cache_duration = 3600  # 1 hour
     
     def _rate_limit(self):
         """Implement rate limiting to respect Alpha Vantage limits."""
-        current_time = time.time()
-        
-        # Reset counter if a minute has passed
-        if current_time - self.last_reset_time >= 60:
-            self.call_count = 0
-            self.last_reset_time = current_time
-        
-        # Check if we're at the limit
-        if self.call_count >= self.calls_per_minute:
-            sleep_time = 60 - (current_time - self.last_reset_time)
-            if sleep_time > 0:
-                logging.info(f"Rate limit reached. Sleeping for {sleep_time:.1f} seconds...")
-                time.sleep(sleep_time)
-                self.call_count = 0
-                self.last_reset_time = time.time()
-        
-        # Ensure minimum delay between calls (12.5 seconds as per your test script)
-        time_since_last = current_time - self.last_call_time
-        if time_since_last < 12.5:
-            sleep_time = 12.5 - time_since_last
-            time.sleep(sleep_time)
-        
-        self.last_call_time = time.time()
-        self.call_count += 1
+        self._bucket.acquire(1)
     
-    def _safe_series(self, symbol: str, max_retries: int = 3) -> Optional[Dict[str, Any]]:
+    # Backoff policy: exponential with jitter so concurrent workers do not
+    # retry in lockstep on the same boundary
+    BACKOFF_BASE = 1.0
+    BACKOFF_CAP = 30.0
+    BACKOFF_JITTER = 0.5
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Compute the retry delay, preferring a server-provided Retry-After."""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        delay = min(self.BACKOFF_CAP, self.BACKOFF_BASE * 2 ** attempt)
+        return delay * (1 + random.uniform(-self.BACKOFF_JITTER, self.BACKOFF_JITTER))
+
+    @staticmethod
+    def _extract_closes(time_series: Dict[str, Any]) -> Optional[Dict[str, float]]:
+        """
+        Reduce a raw "Time Series (Daily)" payload to a compact {date: close}
+        float mapping. Downstream code only reads close, so discarding
+        open/high/low/volume at parse time cuts the working set ~5x.
+        """
+        closes = {}
+        for date_key, values in time_series.items():
+            try:
+                closes[date_key] = float(values["4. close"])
+            except (KeyError, ValueError):
+                continue
+        return closes or None
+
+    def _safe_series(self, symbol: str, max_retries: int = 3, outputsize: str = "full") -> Optional[Dict[str, float]]:
         """
-        Safely fetch time series data for a symbol with retry logic.
-        Based on your working test script.
+        Safely fetch the daily-close series for a symbol with retry logic,
+        returned as a compact {date: close} mapping.
         """
         for attempt in range(max_retries):
+            retry_after = None
             try:
                 self._rate_limit()
-                
+
                 params = {
                     "function": "TIME_SERIES_DAILY",
                     "symbol": symbol,
-                    "outputsize": "compact",
+                    "outputsize": outputsize,
                     "apikey": self.api_key
                 }
-                
-                response = requests.get(self.base_url, params=params, timeout=30)
+
+                response = self.session.get(self.base_url, params=params, timeout=30)
+                retry_after = response.headers.get("Retry-After")
                 response.raise_for_status()
-                data = response.json()
-                
+                data = orjson.loads(response.content)
+
                 # Check for API errors
                 if "Time Series (Daily)" not in data:
                     msg = data.get("Note") or data.get("Information") or data.get("Error Message")
-                    if "API call frequency" in str(msg) or "rate limit" in str(msg).lower():
-                        # Rate limit error - wait and retry
-                        if attempt < max_retries - 1:
-                            wait_time = (2 ** attempt) * 60  # Exponential backoff: 2min, 4min, 8min
-                            logging.warning(f"Rate limit hit for {symbol}, waiting {wait_time}s before retry {attempt + 1}/{max_retries}")
-                            time.sleep(wait_time)
-                            continue
+                    if "Invalid API call" in str(msg):
+                        # Unrecoverable - the symbol is wrong, retrying wastes quota
+                        logging.warning(f"{symbol}: invalid API call, not retrying")
+                        return None
                     raise RuntimeError(msg or f"{symbol}: unknown API response")
-                
-                return data["Time Series (Daily)"]
-                
+
+                return self._extract_closes(data["Time Series (Daily)"])
+
+            except requests.HTTPError as e:
+                # Only rate limiting (429) and server errors are retryable
+                status = e.response.status_code if e.response is not None else None
+                if status is not None and status != 429 and status < 500:
+                    logging.error(f"Failed to fetch data for {symbol}: HTTP {status}, not retrying")
+                    return None
+                logging.error(f"Failed to fetch data for {symbol} (attempt {attempt + 1}/{max_retries}): {e}")
             except Exception as e:
                 logging.error(f"Failed to fetch data for {symbol} (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) * 30  # Exponential backoff: 30s, 60s, 120s
-                    logging.info(f"Retrying {symbol} in {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    logging.error(f"All {max_retries} attempts failed for {symbol}")
-        
+
+            if attempt < max_retries - 1:
+                wait_time = self._backoff_delay(attempt, retry_after)
+                logging.info(f"Retrying {symbol} in {wait_time:.1f}s...")
+                time.sleep(wait_time)
+            else:
+                logging.error(f"All {max_retries} attempts failed for {symbol}")
+
         return None
     
-    def _nearest_date(self, time_series: Dict[str, Any], target_date: datetime) -> Optional[Tuple[str, float]]:
+    async def _safe_series_async(self, client: "httpx.AsyncClient", symbol: str,
+                                 outputsize: str = "full") -> Optional[Dict[str, float]]:
         """
-        Find the nearest available date in the time series.
-        Based on your working test script.
+        Async single-attempt fetch of the daily-close series for a symbol.
         """
-        current_date = target_date
-        max_attempts = 30  # Look back up to 30 days
-        
-        for _ in range(max_attempts):
-            date_key = current_date.strftime("%Y-%m-%d")
-            if date_key in time_series:
-                try:
-                    close_price = float(time_series[date_key]["4. close"])
-                    return date_key, close_price
-                except (KeyError, ValueError):
-                    pass
-            current_date -= timedelta(days=1)
-        
-        return None
+        # The token bucket sleeps when empty, so acquire it off the event loop
+        await asyncio.to_thread(self._rate_limit)
+        try:
+            params = {
+                "function": "TIME_SERIES_DAILY",
+                "symbol": symbol,
+                "outputsize": outputsize,
+                "apikey": self.api_key
+            }
+
+            response = await client.get(self.base_url, params=params)
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+
+            if "Time Series (Daily)" not in data:
+                msg = data.get("Note") or data.get("Information") or data.get("Error Message")
+                logging.error(f"Failed to fetch data for {symbol}: {msg or 'unknown API response'}")
+                return None
+
+            return self._extract_closes(data["Time Series (Daily)"])
+
+        except Exception as e:
+            logging.error(f"Failed to fetch data for {symbol}: {e}")
+            return None
+
+    async def _warm_series_cache_async(self, tickers: Tuple[str, ...]) -> None:
+        """
+        Concurrently fetch and cache daily-close series for every ticker that
+        is not already cached. HTTP/2 multiplexes the requests over one
+        TCP/TLS session, and the semaphore plus token bucket keep concurrency
+        inside the API quota.
+        """
+        uncached = [t for t in tickers if self.cache.get_series(t) is None]
+        if not uncached:
+            return
+
+        semaphore = asyncio.Semaphore(self.max_workers)
+        limits = httpx.Limits(max_connections=16)
+
+        async with httpx.AsyncClient(http2=True, limits=limits, timeout=30) as client:
+
+            async def fetch(ticker: str) -> None:
+                async with semaphore:
+                    symbol = self._resolved_symbol.get(ticker) or self._normalize_ticker(ticker)
+                    closes = await self._safe_series_async(client, symbol)
+                    if closes is None and symbol != ticker:
+                        closes = await self._safe_series_async(client, ticker)
+                    if closes:
+                        self.cache.set_series(ticker, closes)
+
+            await asyncio.gather(*(fetch(ticker) for ticker in uncached))
+
+    def _warm_series_cache(self, tickers: Tuple[str, ...]) -> None:
+        """Sync wrapper so Streamlit callers get the concurrent fetch path."""
+        asyncio.run(self._warm_series_cache_async(tickers))
+
+    def _batch_quotes(self, symbols: Tuple[str, ...]) -> Dict[str, float]:
+        """
+        Fetch current quotes for many symbols in one HTTP round trip using the
+        BATCH_STOCK_QUOTES endpoint. Returns {symbol: price} for every symbol
+        the API recognised; unknown symbols are simply absent from the result.
+        """
+        quotes: Dict[str, float] = {}
+
+        # The endpoint accepts up to 100 symbols per request
+        chunk_size = 100
+        for i in range(0, len(symbols), chunk_size):
+            chunk = symbols[i:i + chunk_size]
+            try:
+                self._rate_limit()
+
+                params = {
+                    "function": "BATCH_STOCK_QUOTES",
+                    "symbols": ",".join(chunk),
+                    "apikey": self.api_key
+                }
+
+                response = self.session.get(self.base_url, params=params, timeout=30)
+                response.raise_for_status()
+                data = orjson.loads(response.content)
+
+                for entry in data.get("Stock Quotes", []):
+                    try:
+                        symbol = entry["1. symbol"].upper()
+                        quotes[symbol] = float(entry["2. price"])
+                    except (KeyError, ValueError):
+                        continue
+
+            except Exception as e:
+                logging.error(f"Batch quote request failed for {chunk}: {e}")
+
+        return quotes
+
+    def _get_daily_closes(self, ticker: str) -> Optional[Dict[str, float]]:
+        """
+        Get the daily-close series for a ticker as {date: close}, parsed once
+        and cached so overlapping lookups skip both the API call and the
+        per-request JSON reparse.
+        """
+        cached_series = self.cache.get_series(ticker)
+        if cached_series is not None:
+            logging.info(f"Using cached daily series for {ticker}")
+            return cached_series
+
+        # Fetch the full-length series once; every price/period window for
+        # this ticker is then answered locally instead of refetching per call
+
+        # _try_ticker_variations already probes the original ticker last, so
+        # a miss here is final - no separate fallback fetch
+        closes = self._try_ticker_variations(ticker)
+        if not closes:
+            return None
+
+        self.cache.set_series(ticker, closes)
+        return closes
+
+    @staticmethod
+    def _to_price_series(closes: Dict[str, float]) -> pd.Series:
+        """
+        Build a float Series over a sorted DatetimeIndex from a {date: close}
+        map, so nearest-date lookups run as C-level .asof bisects.
+        """
+        series = pd.Series(closes, dtype=float)
+        series.index = pd.to_datetime(series.index)
+        return series.sort_index()
+
+    def _nearest_date(self, series: pd.Series, target_date: datetime) -> Optional[Tuple[str, float]]:
+        """
+        Find the close on the nearest trading day at or before the target.
+        pd.Series.asof bisects int64 timestamps in C, replacing the old
+        Python probe loop entirely.
+        """
+        if series.empty:
+            return None
+
+        target_ts = pd.Timestamp(target_date)
+        value = series.asof(target_ts)
+        if pd.isna(value):
+            return None
+
+        date_ts = series.index.asof(target_ts)
+        # Keep the old behavior of not matching more than 30 days back
+        if (target_ts - date_ts).days > 30:
+            return None
+
+        return date_ts.strftime("%Y-%m-%d"), float(value)
     
     def get_current_price(self, ticker: str) -> Optional[float]:
         """
@@ -163,28 +381,22 @@ class AlphaVantageService:
         """
         try:
             # Check cache first
-            current_time = time.time()
-            if ticker in self.price_cache:
-                cache_time, cache_price = self.price_cache[ticker]
-                if current_time - cache_time < self.cache_duration:
-                    logging.info(f"Using cached price for {ticker}: ${cache_price}")
-                    return cache_price
-            
-            # Try ticker variations first (more likely to work)
-            time_series = self._try_ticker_variations(ticker)
-            if not time_series:
-                # Fallback to original ticker
-                time_series = self._safe_series(ticker)
-                if not time_series:
-                    return None
-            
+            cached_price = self.cache.get_rate(ticker)
+            if cached_price is not None:
+                logging.info(f"Using cached price for {ticker}: ${cached_price}")
+                return cached_price
+
+            closes = self._get_daily_closes(ticker)
+            if not closes:
+                return None
+
             # Get the most recent price (today or last trading day)
             today = datetime.now()
-            nearest = self._nearest_date(time_series, today)
+            nearest = self._nearest_date(self._to_price_series(closes), today)
             
             if nearest:
                 date_key, price = nearest
-                self.price_cache[ticker] = (current_time, price)
+                self.cache.set_rate(ticker, price)
                 logging.info(f"Successfully retrieved current price for {ticker}: ${price} on {date_key}")
                 return price
             
@@ -199,26 +411,21 @@ class AlphaVantageService:
         """
         try:
             # Check cache first
-            cache_key = f"{ticker}_{start_date.strftime('%Y-%m-%d')}_{end_date.strftime('%Y-%m-%d')}"
-            current_time = time.time()
-            
-            if cache_key in self.historical_cache:
-                cache_time, cache_data = self.historical_cache[cache_key]
-                if current_time - cache_time < self.cache_duration:
-                    logging.info(f"Using cached historical data for {ticker}")
-                    return cache_data
-            
-            # Try ticker variations first (more likely to work)
-            time_series = self._try_ticker_variations(ticker)
-            if not time_series:
-                # Fallback to original ticker
-                time_series = self._safe_series(ticker)
-                if not time_series:
-                    return None
-            
-            # Find start and end prices
-            start_nearest = self._nearest_date(time_series, start_date)
-            end_nearest = self._nearest_date(time_series, end_date)
+            cache_key = f"{ticker.upper()}:{start_date.strftime('%Y-%m-%d')}:{end_date.strftime('%Y-%m-%d')}"
+
+            cached_data = self.cache.get_hist(cache_key)
+            if cached_data is not None:
+                logging.info(f"Using cached historical data for {ticker}")
+                return cached_data
+
+            closes = self._get_daily_closes(ticker)
+            if not closes:
+                return None
+
+            # Find start and end prices - build the indexed series once for both lookups
+            series = self._to_price_series(closes)
+            start_nearest = self._nearest_date(series, start_date)
+            end_nearest = self._nearest_date(series, end_date)
             
             if start_nearest and end_nearest:
                 start_date_key, start_price = start_nearest
@@ -239,7 +446,7 @@ class AlphaVantageService:
                 }
                 
                 # Cache the result
-                self.historical_cache[cache_key] = (current_time, result)
+                self.cache.set_hist(cache_key, result)
                 logging.info(f"Successfully retrieved historical data for {ticker}: ${start_price} → ${end_price} ({pct_change:.2f}%)")
                 return result
             
@@ -254,26 +461,63 @@ class AlphaVantageService:
         """
         if not tickers:
             return {}
-        
+
         stock_data = {}
-        
+
+        # Serve what we can from the cache before spending any quota
+        uncached = []
         for ticker in tickers:
-            current_price = self.get_current_price(ticker)
-            
-            if current_price:
+            cached_price = self.cache.get_rate(ticker)
+            if cached_price is not None:
                 stock_data[ticker] = {
                     'company_name': ticker,
-                    'current_price': current_price,
+                    'current_price': cached_price,
                     'source': 'Alpha Vantage API'
                 }
-            else:
-                stock_data[ticker] = {
-                    'company_name': ticker,
-                    'current_price': None,
-                    'source': 'None'
-                }
-        
-        valid_count = sum(1 for data in stock_data.values() 
+                continue
+            uncached.append(ticker)
+
+        # One batch-quote round trip covers all remaining tickers instead of
+        # one TIME_SERIES_DAILY call (and 12.5s gate) per ticker
+        missing = []
+        if uncached:
+            batch_symbols = tuple(self._normalize_ticker(t) for t in uncached)
+            quotes = self._batch_quotes(batch_symbols)
+
+            for ticker, symbol in zip(uncached, batch_symbols):
+                price = quotes.get(symbol)
+                if price:
+                    self.cache.set_rate(ticker, price)
+                    stock_data[ticker] = {
+                        'company_name': ticker,
+                        'current_price': price,
+                        'source': 'Alpha Vantage API'
+                    }
+                else:
+                    missing.append(ticker)
+
+        # Fall back to the per-ticker path (with variation retries) only for
+        # symbols the batch endpoint did not recognise. Warming the series
+        # cache concurrently first makes the per-ticker calls local reads.
+        if missing:
+            self._warm_series_cache(tuple(missing))
+            for ticker in missing:
+                current_price = self.get_current_price(ticker)
+
+                if current_price:
+                    stock_data[ticker] = {
+                        'company_name': ticker,
+                        'current_price': current_price,
+                        'source': 'Alpha Vantage API'
+                    }
+                else:
+                    stock_data[ticker] = {
+                        'company_name': ticker,
+                        'current_price': None,
+                        'source': 'None'
+                    }
+
+        valid_count = sum(1 for data in stock_data.values()
                          if data.get('current_price') is not None and data.get('current_price') > 0)
         logging.info(f"Successfully retrieved current prices for {valid_count}/{len(tickers)} tickers")
         return stock_data
@@ -284,25 +528,63 @@ class AlphaVantageService:
         """
         if not tickers:
             return {}
-        
+
         performance_data = {}
-        
+
+        # Convert pandas Timestamp to datetime
+        start_dt = start_date.to_pydatetime()
+        end_dt = end_date.to_pydatetime()
+
+        # Warm the series cache for all tickers concurrently; the per-ticker
+        # window lookups below are then pure local compute on cached closes
+        self._warm_series_cache(tickers)
+
+        # Resolve start/end closes per ticker, deferring the return math so
+        # the whole batch is computed in one vectorized pass
+        pending = []
         for ticker in tickers:
-            logging.info(f"Fetching historical price for {ticker} using Alpha Vantage...")
-            
-            # Convert pandas Timestamp to datetime
-            start_dt = start_date.to_pydatetime()
-            end_dt = end_date.to_pydatetime()
-            
-            historical_data = self.get_historical_performance(ticker, start_dt, end_dt)
-            
-            if historical_data:
-                performance_data[ticker] = historical_data
-                logging.info(f"Successfully retrieved historical price for {ticker}: ${historical_data['first_close']} → ${historical_data['last_close']} ({historical_data['pct_change']:.2f}%)")
-            else:
-                logging.warning(f"No historical data found for {ticker}")
-                performance_data[ticker] = {"error": f"No historical data available for {ticker}"}
-        
+            cache_key = f"{ticker.upper()}:{start_dt.strftime('%Y-%m-%d')}:{end_dt.strftime('%Y-%m-%d')}"
+            cached_data = self.cache.get_hist(cache_key)
+            if cached_data is not None:
+                performance_data[ticker] = cached_data
+                continue
+
+            closes = self._get_daily_closes(ticker)
+            if closes:
+                series = self._to_price_series(closes)
+                start_nearest = self._nearest_date(series, start_dt)
+                end_nearest = self._nearest_date(series, end_dt)
+                if start_nearest and end_nearest:
+                    pending.append((ticker, cache_key, start_nearest, end_nearest))
+                    continue
+
+            logging.warning(f"No historical data found for {ticker}")
+            performance_data[ticker] = {"error": f"No historical data available for {ticker}"}
+
+        if pending:
+            start_prices = np.array([start_nearest[1] for _, _, start_nearest, _ in pending])
+            end_prices = np.array([end_nearest[1] for _, _, _, end_nearest in pending])
+
+            abs_changes = np.round(end_prices - start_prices, 2)
+            pct_changes = np.round(
+                np.where(start_prices != 0, (end_prices / start_prices - 1) * 100, 0.0), 2
+            )
+
+            for i, (ticker, cache_key, start_nearest, end_nearest) in enumerate(pending):
+                result = {
+                    "ticker": ticker.upper(),
+                    "first_date": start_nearest[0],
+                    "last_date": end_nearest[0],
+                    "first_close": round(start_nearest[1], 2),
+                    "last_close": round(end_nearest[1], 2),
+                    "abs_change": float(abs_changes[i]),
+                    "pct_change": float(pct_changes[i]),
+                    "source": "Alpha Vantage API"
+                }
+                self.cache.set_hist(cache_key, result)
+                performance_data[ticker] = result
+                logging.info(f"Successfully retrieved historical price for {ticker}: ${result['first_close']} → ${result['last_close']} ({result['pct_change']:.2f}%)")
+
         valid_count = sum(1 for data in performance_data.values() if "error" not in data)
         logging.info(f"Successfully retrieved historical data for {valid_count}/{len(tickers)} tickers")
         return performance_data
@@ -322,11 +604,20 @@ class AlphaVantageService:
     
     def validate_tickers(self, tickers: List[str]) -> List[str]:
         """
-        Validate tickers by checking if current prices can be fetched.
+        Validate tickers with a single batch quote call - a symbol is valid
+        if the API returns a quote for it. Symbols the batch endpoint drops
+        (e.g. index tickers) get one per-ticker probe before being rejected.
         """
+        if not tickers:
+            return []
+
+        quotes = self._batch_quotes(tuple(self._normalize_ticker(t) for t in tickers))
+
         valid_tickers = []
         for ticker in tickers:
-            if self.get_current_price(ticker):
+            if self._normalize_ticker(ticker) in quotes:
+                valid_tickers.append(ticker)
+            elif self.get_current_price(ticker):
                 valid_tickers.append(ticker)
             else:
                 logging.warning(f"Invalid ticker: {ticker}")
@@ -374,57 +665,83 @@ class AlphaVantageService:
             "successful_tickers": len(tickers) - len(failed_tickers)
         }
 
-    def _normalize_ticker(self, ticker: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _normalize_ticker(ticker: str) -> str:
         """
-        Normalize ticker symbol to Alpha Vantage format.
+        Normalize ticker symbol to Alpha Vantage format. Memoized - the
+        result is a stable function of the input symbol.
         """
         # Convert to uppercase and remove any extra spaces
         normalized = ticker.upper().strip()
-        
+
         # Check if we have a direct mapping
-        if normalized in self.ticker_mapping:
-            return self.ticker_mapping[normalized]
-        
+        if normalized in TICKER_MAPPING:
+            return TICKER_MAPPING[normalized]
+
         return normalized
     
-    def _try_ticker_variations(self, original_ticker: str) -> Optional[Dict[str, Any]]:
+    def _try_ticker_variations(self, original_ticker: str) -> Optional[Dict[str, float]]:
         """
         Try multiple ticker variations to find valid data.
         Returns the first successful result or None if all fail.
         """
-        variations = []
-        
-        # Add normalized version first (most likely to work)
-        normalized = self._normalize_ticker(original_ticker)
-        if normalized != original_ticker:
-            variations.append(normalized)
-        
-        # Add common variations for certain patterns
-        if original_ticker.endswith('B') and len(original_ticker) == 4:
-            # Try adding dot (e.g., BRKB -> BRK.B)
-            dot_version = original_ticker[:-1] + '.' + original_ticker[-1]
-            variations.append(dot_version)
-        
-        # Add original ticker last (in case it works as-is)
-        variations.append(original_ticker)
-        
+        # Skip tickers that recently failed every variation - re-probing a
+        # known-bad symbol costs several rate-limited calls for nothing
+        failed_at = self._negative_cache.get(original_ticker)
+        if failed_at is not None:
+            if time.time() - failed_at < self.negative_cache_duration:
+                logging.info(f"Skipping {original_ticker}: failed recently, negative-cached")
+                return None
+            del self._negative_cache[original_ticker]
+
+        # Short-circuit: if this ticker already resolved once, fetch the
+        # winning symbol directly instead of re-probing every variation
+        resolved = self._resolved_symbol.get(original_ticker)
+        if resolved is not None:
+            return self._safe_series(resolved, max_retries=1)
+
+        # Normalized version first (most likely to work), pattern-rule
+        # variations next, original ticker last in case it works as-is;
+        # dict.fromkeys dedupes while preserving that order
+        rule = _VARIATION_RULES.get(_classify_ticker(original_ticker))
+        generated = rule(original_ticker) if rule else []
+        variations = list(dict.fromkeys(
+            [self._normalize_ticker(original_ticker)] + generated + [original_ticker]
+        ))
+
         # Try variations for the original ticker
         for variation in variations:
             logging.info(f"Trying ticker variation: {original_ticker} -> {variation}")
             time_series = self._safe_series(variation, max_retries=1)  # Quick retry
             if time_series:
                 logging.info(f"Success with ticker variation: {original_ticker} -> {variation}")
+                self._resolved_symbol[original_ticker] = variation
                 return time_series
             else:
                 logging.debug(f"Variation {variation} failed for {original_ticker}")
         
         logging.warning(f"All ticker variations failed for {original_ticker}: tried {variations}")
+        self._negative_cache[original_ticker] = time.time()
         return None
 
+    def invalidate(self, ticker: str) -> None:
+        """Forget a negative-cache entry so the ticker is retried immediately."""
+        self._negative_cache.pop(ticker, None)
+
+_service_lock = threading.Lock()
+_service: Optional[AlphaVantageService] = None
+
 def get_alpha_vantage_service() -> AlphaVantageService:
     """
-    Get or create an AlphaVantageService instance.
+    Get or create the shared AlphaVantageService instance. Construction is
+    gated by a lock with a double-check, so concurrent first-callers (the
+    prewarm/prefetch daemon threads) cannot build two services with split
+    caches and rate limiters.
     """
-    if not hasattr(get_alpha_vantage_service, '_instance'):
-        get_alpha_vantage_service._instance = AlphaVantageService()
-    return get_alpha_vantage_service._instance 
\ No newline at end of file
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = AlphaVantageService()
+    return _service 
\ No newline at end of file
@@ -1,20 +1,27 @@
 #app.py
 import streamlit as st
 import pandas as pd
+import numpy as np
+import hashlib
 import json
+import orjson
 import os
+import time
 from datetime import datetime, timedelta
 import logging
 from typing import Dict, List, Tuple, Optional, Any
+import queue
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
 from io import BytesIO
 
-# Document processing imports
-import PyPDF2
-import docx
-import openpyxl
+# Document processing libs (PyPDF2, docx, openpyxl) are imported lazily
+# inside their extractor functions; only the code path a given upload
+# actually takes pays the import cost
 from openai import OpenAI
-import yfinance as yf
 
 # --- Corrected Imports ---
 # Imports the necessary functions from your other project files
@@ -25,13 +32,27 @@ from google_sheets_storage import (
     get_user_portfolio_from_sheets,
     get_all_users_from_sheets
 )
-# This now correctly imports the newsletter function from main.py
-from main import generate_newsletter_for_user
-
+# The newsletter pipeline (main.py) is imported lazily inside the send
+# handlers; it pulls in the whole generation stack, which most renders
+# never touch
 
 # ---------- Configuration ----------
 OPENAI_MODEL = "gpt-4o-mini"
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+
+@st.cache_resource
+def _openai_client() -> OpenAI:
+    """
+    One OpenAI client shared process-wide, on an explicit httpx client with
+    HTTP/2 and keep-alive so calls reuse one TLS connection instead of
+    paying a handshake each time.
+    """
+    import httpx
+    http_client = httpx.Client(
+        timeout=60,
+        limits=httpx.Limits(max_keepalive_connections=20),
+        transport=httpx.HTTPTransport(retries=2, http2=True),
+    )
+    return OpenAI(api_key=st.secrets["OPENAI_API_KEY"], http_client=http_client)
 
 # ---------- Logging ----------
 logging.basicConfig(
@@ -40,168 +61,309 @@ logging.basicConfig(
     datefmt="%H:%M:%S"
 )
 
+# ---------- Cached Data Access ----------
+# Quote endpoints cap out around 20 symbols per request; past that they
+# silently degrade to per-ticker lookups
+_BATCH_CHUNK_SIZE = 20
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_batch(tickers: Tuple[str, ...]) -> Dict[str, Dict[str, Any]]:
+    """Cache batch quotes across Streamlit reruns for identical ticker sets."""
+    if len(tickers) <= _BATCH_CHUNK_SIZE:
+        return get_batch_stock_data(tickers)
+    chunks = [tickers[i:i + _BATCH_CHUNK_SIZE]
+              for i in range(0, len(tickers), _BATCH_CHUNK_SIZE)]
+    merged: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as executor:
+        futures = [executor.submit(get_batch_stock_data, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            merged.update(future.result())
+    return merged
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _build_portfolio_df(holdings_items: Tuple[Tuple[str, float], ...]) -> Tuple[pd.DataFrame, float]:
+    """
+    Build the priced portfolio table and its total for a holdings set.
+    Column-wise (dict-of-lists) assembly; the value math runs vectorized in
+    pandas, and the cache means reruns between price refreshes are free.
+    """
+    holdings = dict(holdings_items)
+    portfolio_details = _cached_batch(tuple(sorted(holdings)))
+    priced_tickers = []
+    companies = []
+    shares_list = []
+    price_list = []
+    for ticker, shares in holdings.items():
+        details = portfolio_details.get(ticker)
+        if details and details.get('current_price') is not None:
+            priced_tickers.append(ticker)
+            companies.append(details.get('company_name', ticker))
+            shares_list.append(shares)
+            price_list.append(details.get('current_price', 0))
+    df = pd.DataFrame({
+        'Ticker': priced_tickers,
+        'Company': companies,
+        'Shares': np.array(shares_list),
+        'Current Price': np.array(price_list)
+    })
+    df['Value'] = df['Shares'] * df['Current Price']
+    return df, float(df['Value'].sum()) if len(df) else 0.0
+
+@st.cache_resource
+def _save_executor() -> ThreadPoolExecutor:
+    """Shared pool for background Google Sheets writes."""
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource
+def _sheet_ready() -> bool:
+    """Run the Google Sheet init handshake once per process, not per session."""
+    return init_google_sheet()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _all_users() -> List[Dict[str, Any]]:
+    """Cache the subscriber list so each rerun costs at most one Sheets read."""
+    return get_all_users_from_sheets()
+
+# ---------- Extraction Disk Cache ----------
+# Users re-upload the same brokerage statement across sessions; identical
+# bytes mean identical holdings, so the LLM result is cached on disk keyed
+# by content hash instead of re-paying the extraction tokens.
+_LLM_CACHE_DIR = ".llm_cache"
+_LLM_CACHE_TTL = 7 * 86400  # 7 days
+
+def _extraction_cache_path(file_bytes: bytes, file_type: str) -> str:
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    return os.path.join(_LLM_CACHE_DIR, f"{digest}_{file_type}.json")
+
+def _extraction_cache_get(file_bytes: bytes, file_type: str) -> Optional[Dict[str, float]]:
+    """Return cached holdings for identical file bytes, or None on miss."""
+    path = _extraction_cache_path(file_bytes, file_type)
+    try:
+        if os.path.exists(path) and time.time() - os.path.getmtime(path) < _LLM_CACHE_TTL:
+            with open(path) as f:
+                return json.load(f)
+    except Exception as e:
+        logging.warning(f"Could not read extraction cache {path}: {e}")
+    return None
+
+def _extraction_cache_set(file_bytes: bytes, file_type: str, holdings: Dict[str, float]) -> None:
+    """Persist extracted holdings for this exact file content."""
+    try:
+        os.makedirs(_LLM_CACHE_DIR, exist_ok=True)
+        with open(_extraction_cache_path(file_bytes, file_type), "w") as f:
+            json.dump(holdings, f)
+    except Exception as e:
+        logging.warning(f"Could not write extraction cache: {e}")
+
+# ---------- Ticker Pre-Filter ----------
+# Candidate tickers are 2-5 capitals with an optional class suffix (BRK.B)
+_TICKER_CANDIDATE_RE = re.compile(r"\b[A-Z]{2,5}(?:[.-][A-Z])?\b")
+
+# Matches completed "ticker": "XXXX" pairs in the partially streamed JSON
+_STREAM_TICKER_RE = re.compile(r'"ticker"\s*:\s*"([A-Za-z.\-\^]{1,8})"')
+
+# Shape check plus blocklist for strings the LLM returns that are not
+# tickers ("CASH", "TOTAL", ...); each one let through costs an HTTP
+# round-trip downstream
+_VALID_TICKER_RE = re.compile(r'^[A-Z]{1,5}(?:[.-][A-Z])?$')
+_NON_TICKERS = frozenset({"CASH", "TOTAL", "USD", "NA", "NONE", "NULL"})
+
+def _looks_like_ticker(ticker: str) -> bool:
+    return bool(_VALID_TICKER_RE.match(ticker)) and ticker not in _NON_TICKERS
+
+# Alpha Vantage normalization is three deterministic string rules; no LLM
+# involvement needed. Aliases mirror TICKER_MAPPING in alpha_vantage_service.
+_TICKER_ALIASES = {"BRKB": "BRK-B", "BRKA": "BRK-A"}
+
+def _normalize_ticker(ticker: str) -> str:
+    """Uppercase, dots to hyphens, and known Berkshire aliases."""
+    normalized = ticker.strip().upper().replace(".", "-")
+    return _TICKER_ALIASES.get(normalized, normalized)
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def _known_symbols() -> frozenset:
+    """Fetch the NASDAQ screener symbol list once per day for regex validation."""
+    try:
+        import requests
+        response = requests.get(
+            "https://api.nasdaq.com/api/screener/stocks",
+            params={"download": "true"},
+            headers={"User-Agent": "Mozilla/5.0"},
+            timeout=15
+        )
+        response.raise_for_status()
+        rows = response.json().get("data", {}).get("rows", [])
+        symbols = frozenset(row["symbol"].strip().upper() for row in rows if row.get("symbol"))
+        logging.info(f"Loaded {len(symbols)} exchange symbols for ticker pre-filter")
+        return symbols
+    except Exception as e:
+        logging.warning(f"Could not load symbol list for ticker pre-filter: {e}")
+        return frozenset()
+
+def _regex_extract(content: str) -> Dict[str, float]:
+    """
+    Extract holdings without the LLM: scan for ticker-shaped tokens and keep
+    the ones that are real exchange symbols. Shares default to 100, matching
+    the AI path's fallback.
+    """
+    symbols = _known_symbols()
+    if not symbols:
+        return {}
+    candidates = set(_TICKER_CANDIDATE_RE.findall(content))
+    return {ticker: 100.0 for ticker in candidates if ticker in symbols}
+
 # ---------- Document Processing Functions ----------
-def extract_text_from_pdf(file_bytes: bytes) -> str:
-    """Extract text from PDF file."""
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def extract_text_from_pdf(file_bytes: bytes, max_chars: int = 8000) -> str:
+    """Extract text from PDF file, stopping once enough content is collected."""
     try:
-        pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        # pypdfium2 wraps the C pdfium library and extracts text far faster
+        # than PyPDF2's pure-Python page walking; fall back when it is absent
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            pdfium = None
+        parts = []
+        total = 0
+        # The AI prompt only consumes the first few thousand chars, so stop
+        # extracting pages once we have a comfortable margin past that
+        if pdfium is not None:
+            pdf = pdfium.PdfDocument(file_bytes)
+            try:
+                for page in pdf:
+                    page_text = page.get_textpage().get_text_range() or ""
+                    parts.append(page_text)
+                    total += len(page_text)
+                    if total >= max_chars:
+                        break
+            finally:
+                pdf.close()
+        else:
+            import PyPDF2
+            pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+            for page in pdf_reader.pages:
+                page_text = page.extract_text() or ""
+                parts.append(page_text)
+                total += len(page_text)
+                if total >= max_chars:
+                    break
+        return "\n".join(parts)
     except Exception as e:
         logging.error(f"Error extracting text from PDF: {e}")
         return ""
 
-def extract_text_from_docx(file_bytes: bytes) -> str:
-    """Extract text from Word document."""
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def extract_text_from_docx(file_bytes: bytes, max_chars: int = 8000) -> str:
+    """Extract text from Word document, stopping once enough content is collected."""
     try:
+        import docx
         doc = docx.Document(BytesIO(file_bytes))
-        text = ""
+        parts = []
+        total = 0
         for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
+            parts.append(paragraph.text)
+            total += len(paragraph.text)
+            if total >= max_chars:
+                return "\n".join(parts)
         for table in doc.tables:
             for row in table.rows:
-                for cell in row.cells:
-                    text += cell.text + "\t"
-                text += "\n"
-        return text
+                row_text = "\t".join(cell.text for cell in row.cells)
+                parts.append(row_text)
+                total += len(row_text)
+                if total >= max_chars:
+                    return "\n".join(parts)
+        return "\n".join(parts)
     except Exception as e:
         logging.error(f"Error extracting text from DOCX: {e}")
         return ""
 
-def extract_data_from_excel(file_bytes: bytes) -> pd.DataFrame:
-    """Extract data from Excel file."""
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def extract_data_from_excel(file_bytes: bytes, max_chars: int = 8000) -> str:
+    """
+    Extract tab-separated text from Excel file by streaming rows with
+    openpyxl in read-only mode. Downstream code only feeds a text blob to
+    the LLM, so no DataFrame is ever materialized.
+    """
     try:
+        import openpyxl
         logging.info("Starting Excel file extraction...")
-        excel_file = pd.ExcelFile(BytesIO(file_bytes))
-        logging.info(f"Excel file sheets: {excel_file.sheet_names}")
-        
-        all_data = []
-        for sheet_name in excel_file.sheet_names:
-            logging.info(f"Processing sheet: {sheet_name}")
-            df = pd.read_excel(BytesIO(file_bytes), sheet_name=sheet_name)
-            logging.info(f"Sheet {sheet_name} shape: {df.shape}")
-            logging.info(f"Sheet {sheet_name} columns: {list(df.columns)}")
-            all_data.append(df)
-        
-        if all_data:
-            combined_df = pd.concat(all_data, ignore_index=True)
-            logging.info(f"Combined data shape: {combined_df.shape}")
-            return combined_df
-        else:
+        workbook = openpyxl.load_workbook(BytesIO(file_bytes), read_only=True, data_only=True)
+        logging.info(f"Excel file sheets: {workbook.sheetnames}")
+
+        parts = []
+        total = 0
+        for worksheet in workbook.worksheets:
+            logging.info(f"Processing sheet: {worksheet.title}")
+            for row in worksheet.iter_rows(values_only=True):
+                line = "\t".join("" if value is None else str(value) for value in row)
+                parts.append(line)
+                total += len(line)
+                if total >= max_chars:
+                    logging.info(f"Collected {total} chars, stopping Excel extraction early")
+                    workbook.close()
+                    return "\n".join(parts)
+
+        workbook.close()
+        if not parts:
             logging.warning("No data found in Excel file")
-            return pd.DataFrame()
+        return "\n".join(parts)
     except Exception as e:
         logging.error(f"Error extracting data from Excel: {e}", exc_info=True)
-        return pd.DataFrame()
+        return ""
 
-def validate_and_normalize_tickers(tickers: List[str]) -> Dict[str, str]:
-    """
-    Use AI to validate and normalize ticker symbols for Alpha Vantage compatibility.
-    Returns a mapping of original ticker to normalized ticker.
+# Strict schema keeps the extraction response short and guaranteed parseable,
+# so there is no free-form prose to pay for or re-prompt over
+_HOLDINGS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "holdings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "ticker": {"type": "string"},
+                    "shares": {"type": "number"}
+                },
+                "required": ["ticker", "shares"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["holdings"],
+    "additionalProperties": False
+}
+
+def _prompt_excerpt(content: str, head: int = 1500, cap: int = 4000) -> str:
     """
-    if not tickers:
-        return {}
-    
-    prompt = f"""
-    You are a financial data expert specializing in stock ticker format normalization for the Alpha Vantage API.
-
-    I have the following stock tickers that need to be checked for Alpha Vantage format compatibility:
-    {tickers}
-
-    IMPORTANT: Assume ALL tickers are valid. Only make format changes if you know for certain that Alpha Vantage requires a different format.
-
-    ALPHA VANTAGE FORMAT RULES:
-    1. Alpha Vantage does NOT support dots (.) in ticker symbols
-    2. For tickers with dots, use hyphens (-) instead (e.g., BRK.B → BRK-B)
-    3. Convert all tickers to uppercase
-    4. Remove any extra spaces or special characters
-
-    KNOWN FORMAT CORRECTIONS (only these specific cases):
-    - BRKB → BRK-B (Berkshire Hathaway Class B - Alpha Vantage uses BRK-B)
-    - BRKA → BRK-A (Berkshire Hathaway Class A - Alpha Vantage uses BRK-A)
-    - BRK.B → BRK-B (convert dots to hyphens)
-    - BRK.A → BRK-A (convert dots to hyphens)
-
-    VALIDATION POLICY:
-    - Trust that all tickers are valid
-    - Only make corrections for known format issues
-    - Do NOT mark any ticker as invalid
-    - Leave tickers unchanged unless you know they need format correction
-
-    Return ONLY a JSON object with this exact format:
-    {{
-        "ticker_mappings": {{
-            "BRKB": "BRK-B",
-            "BRKA": "BRK-A"
-        }},
-        "corrections": [
-            {{
-                "original": "BRKB",
-                "corrected": "BRK-B",
-                "reason": "Berkshire Hathaway Class B uses BRK-B in Alpha Vantage"
-            }}
-        ]
-    }}
-
-    Only include tickers that need known format corrections. If a ticker doesn't need correction, don't include it in the mappings.
+    Trim document content for the extraction prompt: keep the leading chunk,
+    then pull in later lines that look like table rows (a digit next to a
+    ticker-shaped token) up to the overall cap. Input tokens scale latency
+    roughly linearly, so this keeps prompts small without dropping holdings
+    buried deep in long statements.
     """
-    
-    try:
-        logging.info(f"Validating and normalizing {len(tickers)} tickers...")
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a financial data expert specializing in stock ticker validation and normalization for the Alpha Vantage API. Always return valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            response_format={"type": "json_object"}
-        )
-        
-        content = response.choices[0].message.content
-        if content is None:
-            logging.error("OpenAI returned None content for ticker validation")
-            return {}
-        
-        result = json.loads(content)
-        ticker_mappings = result.get("ticker_mappings", {})
-        corrections = result.get("corrections", [])
-        
-        # Log corrections
-        if corrections:
-            logging.info(f"Ticker corrections made: {corrections}")
-        
-        return ticker_mappings
-        
-    except Exception as e:
-        logging.error(f"Error validating tickers: {e}", exc_info=True)
-        return {}
+    if len(content) <= head:
+        return content
+    parts = [content[:head]]
+    total = head
+    for line in content[head:].splitlines():
+        if total >= cap:
+            break
+        if re.search(r"\d", line) and _TICKER_CANDIDATE_RE.search(line):
+            parts.append(line)
+            total += len(line)
+    return "\n".join(parts)
 
-def extract_portfolio_with_ai(content: str, file_type: str) -> Dict[str, float]:
-    """Use GPT to extract portfolio holdings and validate tickers in a batch."""
-    logging.info(f"Starting AI portfolio extraction for {file_type} file...")
-    
-    # Enhanced prompt for better CSV parsing
-    if file_type == 'csv':
-        prompt = f"""
+# Prompt templates materialized once at import; the schema response_format
+# already pins the output shape, so they only describe intent
+_CSV_PROMPT = """
         Analyze this CSV portfolio data and extract stock holdings. Look for:
         - Stock ticker symbols (like AAPL, MSFT, GOOGL, etc.)
         - Number of shares, quantities, or positions
         - Common column names: Ticker, Symbol, Stock, Shares, Quantity, Position, Amount
-        
+
         CSV Content:
-        {content[:4000]}
-        
-        Return ONLY a JSON object with this exact format:
-        {{
-            "holdings": [
-                {{"ticker": "AAPL", "shares": 100}},
-                {{"ticker": "MSFT", "shares": 50}}
-            ]
-        }}
-        
+        {content}
+
         Important:
         - Extract ALL stock tickers found in the data
         - Use the number of shares/quantity from the data
@@ -209,113 +371,363 @@ def extract_portfolio_with_ai(content: str, file_type: str) -> Dict[str, float]:
         - Convert tickers to uppercase
         - Only include valid stock symbols (3-5 letters)
         """
-    else:
-        prompt = f"""
+
+_GENERIC_PROMPT = """
         Analyze the following {file_type} content and extract stock portfolio information.
         Extract all stock tickers and the number of shares held. Look for:
         - Stock symbols (like AAPL, MSFT, GOOGL, etc.)
         - Company names that can be mapped to tickers
         - Number of shares, quantities, or positions
         Content:
-        {content[:4000]}
-        Return the data as a JSON object with this exact format:
-        {{
-            "holdings": [
-                {{"ticker": "AAPL", "shares": 100}},
-                {{"ticker": "MSFT", "shares": 50}}
-            ]
-        }}
+        {content}
         """
-    
+
+def _finalize_holdings(items: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Shared post-processing for LLM-extracted holdings: drop junk strings the
+    schema cannot exclude, then apply the deterministic Alpha Vantage
+    normalization regardless of model drift.
+    """
+    holdings: Dict[str, float] = {}
+    for item in items:
+        original_ticker = item["ticker"].upper()
+        if not _looks_like_ticker(original_ticker):
+            continue
+        normalized_ticker = _normalize_ticker(original_ticker)
+        if normalized_ticker != original_ticker:
+            logging.info(f"Ticker correction: {original_ticker} → {normalized_ticker}")
+        holdings[normalized_ticker] = float(item["shares"])
+    return holdings
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def extract_portfolio_with_ai(content: str, file_type: str) -> Dict[str, float]:
+    """Use GPT to extract portfolio holdings and validate tickers in a batch."""
+    logging.info(f"Starting AI portfolio extraction for {file_type} file...")
+
+    # Fast path: a regex scan against the known-symbol set answers documents
+    # without share counts in microseconds instead of an LLM round trip. Any
+    # digits mean there may be share quantities only the LLM can bind to
+    # tickers, so those fall through.
+    regex_holdings = _regex_extract(content)
+    if len(regex_holdings) >= 2 and not re.search(r"\d", content):
+        logging.info(f"Regex pre-filter extracted {len(regex_holdings)} holdings, skipping LLM")
+        return regex_holdings
+
+    excerpt = _prompt_excerpt(content)
+    if file_type == 'csv':
+        prompt = _CSV_PROMPT.format(content=excerpt)
+    else:
+        prompt = _GENERIC_PROMPT.format(file_type=file_type, content=excerpt)
+
+
     try:
         logging.info("Sending request to OpenAI for portfolio analysis...")
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a financial analyst expert at extracting portfolio data from documents. Always return valid JSON with stock tickers and share quantities."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            response_format={"type": "json_object"}
-        )
-        
+
+        # Tickers spotted in the stream are pushed to a background warmer so
+        # price validation overlaps the remainder of the LLM response instead
+        # of running strictly after it
+        ticker_queue: "queue.Queue[Optional[str]]" = queue.Queue()
+
+        def _warm_prices():
+            from alpha_vantage_service import get_alpha_vantage_service
+            service = get_alpha_vantage_service()
+            batch = []
+            while True:
+                ticker = ticker_queue.get()
+                if ticker is None:
+                    break
+                batch.append(ticker)
+                if len(batch) >= 20:
+                    service.get_current_prices(tuple(batch))
+                    batch = []
+            if batch:
+                service.get_current_prices(tuple(batch))
+
+        warm_thread = threading.Thread(target=_warm_prices, daemon=True)
+        warm_thread.start()
+
+        # Warm regex-spotted tickers in one shot before the request is even
+        # issued, so their quote fetches overlap the whole OpenAI round trip
+        # rather than starting at the first streamed token
+        seen_tickers = set(regex_holdings)
+        if regex_holdings:
+            def _prewarm():
+                from alpha_vantage_service import get_alpha_vantage_service
+                get_alpha_vantage_service().get_current_prices(tuple(regex_holdings))
+            threading.Thread(target=_prewarm, daemon=True).start()
+
+        def _stream_completion(max_tokens: int) -> Tuple[str, Optional[str]]:
+            response_stream = _openai_client().chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": (
+                        "You extract stock portfolio holdings from documents. "
+                        "Return tickers in Alpha Vantage format: uppercase, hyphens "
+                        "instead of dots (BRK.B → BRK-B), and BRKB/BRKA normalized "
+                        "to BRK-B/BRK-A."
+                    )},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0,
+                seed=0,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": "holdings", "schema": _HOLDINGS_SCHEMA, "strict": True}
+                },
+                max_tokens=max_tokens,
+                stream=True
+            )
+            text = ""
+            finish_reason = None
+            for chunk in response_stream:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                if not choice.delta.content:
+                    continue
+                text += choice.delta.content
+                for match in _STREAM_TICKER_RE.finditer(text):
+                    ticker = match.group(1).upper()
+                    if ticker not in seen_tickers and _looks_like_ticker(ticker):
+                        seen_tickers.add(ticker)
+                        ticker_queue.put(ticker)
+            return text, finish_reason
+
+        try:
+            content, finish_reason = _stream_completion(max_tokens=400)
+            if finish_reason == "length":
+                # Portfolios beyond roughly 30 holdings overflow the 400-token
+                # cap and the truncated JSON would fail to parse; retry once
+                # with enough headroom for the largest plausible portfolio
+                logging.info("Holdings JSON hit the token cap, retrying with a larger budget")
+                content, finish_reason = _stream_completion(max_tokens=4000)
+        finally:
+            # The warmer must always receive its sentinel; a raised create or
+            # stream would otherwise leave the daemon thread blocked on the
+            # queue forever, leaking one thread per failed extraction
+            ticker_queue.put(None)
+
         logging.info("Received response from OpenAI, parsing JSON...")
-        content = response.choices[0].message.content
-        if content is None:
-            logging.error("OpenAI returned None content")
+        if not content:
+            logging.error("OpenAI returned empty content")
             return {}
-        result = json.loads(content)  # type: ignore
+        result = orjson.loads(content)
         logging.info(f"OpenAI extracted result: {result}")
         
-        # Extract initial holdings
-        initial_holdings = {
-            item.get("ticker", "").upper(): float(item.get("shares", 100))
-            for item in result.get("holdings", []) if item.get("ticker")
-        }
-        
-        logging.info(f"Initial extracted holdings: {initial_holdings}")
-        
-        if not initial_holdings:
+        final_holdings = _finalize_holdings(result["holdings"])
+        if not final_holdings:
             logging.warning("No potential holdings found in AI response")
             return {}
 
-        # Validate and normalize tickers
-        ticker_list = list(initial_holdings.keys())
-        ticker_mappings = validate_and_normalize_tickers(ticker_list)
-        
-        # Apply corrections and create final holdings
-        final_holdings = {}
-        corrections_made = []
-        
-        for original_ticker, shares in initial_holdings.items():
-            # Get normalized ticker, default to original if not in mappings
-            if original_ticker in ticker_mappings:
-                mapped_ticker = ticker_mappings[original_ticker]
-                normalized_ticker = mapped_ticker if mapped_ticker and mapped_ticker != "" else original_ticker
-            else:
-                normalized_ticker = original_ticker
-            
-            # Apply correction if different from original
-            if normalized_ticker != original_ticker:
-                corrections_made.append(f"{original_ticker} → {normalized_ticker}")
-                logging.info(f"Ticker correction: {original_ticker} → {normalized_ticker}")
-                final_holdings[normalized_ticker] = shares
-            else:
-                # No correction needed, use original ticker
-                final_holdings[original_ticker] = shares
-        
-        if corrections_made:
-            logging.info(f"Ticker corrections applied: {corrections_made}")
-        
         logging.info(f"Final normalized holdings: {final_holdings}")
+
+        # Let the background price warm-up finish so later renders hit cache
+        warm_thread.join(timeout=30)
         return final_holdings
         
     except Exception as e:
         logging.error(f"Error extracting portfolio with AI: {e}", exc_info=True)
         return {}
 
+# Batch variant of _HOLDINGS_SCHEMA: one indexed entry per input document
+_BATCH_HOLDINGS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "documents": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "holdings": _HOLDINGS_SCHEMA["properties"]["holdings"]
+                },
+                "required": ["id", "holdings"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["documents"],
+    "additionalProperties": False
+}
+
+def extract_portfolios_batch(contents: List[Tuple[str, str]]) -> List[Dict[str, float]]:
+    """
+    Extract holdings for several documents with one OpenAI call. Packing N
+    documents into a single indexed prompt pays the system instructions once
+    instead of N times and keeps bulk ingest under the requests-per-minute
+    limit. Takes (content, file_type) pairs; returns one holdings dict per
+    input, in order.
+    """
+    if not contents:
+        return []
+    sections = [
+        f"Document [{i + 1}] ({file_type}):\n{_prompt_excerpt(content)}"
+        for i, (content, file_type) in enumerate(contents)
+    ]
+    prompt = (
+        "For each numbered document below, extract the stock holdings "
+        "(tickers and share counts; default shares to 100 when absent) and "
+        "return one entry per document id.\n\n" + "\n\n".join(sections)
+    )
+    try:
+        response = _openai_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": "You extract stock portfolio holdings from documents."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0,
+            seed=0,
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "portfolios", "schema": _BATCH_HOLDINGS_SCHEMA, "strict": True}
+            },
+            max_tokens=400 * len(contents)
+        )
+        result = orjson.loads(response.choices[0].message.content)
+        by_id = {doc.get("id"): doc.get("holdings", []) for doc in result.get("documents", [])}
+        return [_finalize_holdings(by_id.get(i + 1, [])) for i in range(len(contents))]
+    except Exception as e:
+        logging.error(f"Error in batch portfolio extraction: {e}", exc_info=True)
+        return [{} for _ in contents]
+
+def _parse_csv_holdings(file_bytes: bytes) -> Dict[str, float]:
+    """
+    Deterministic CSV path: when the file has labeled ticker and share
+    columns, build holdings locally and skip the LLM entirely. Returns {}
+    when the headers cannot be identified so the caller can fall through.
+    """
+    try:
+        df = pd.read_csv(BytesIO(file_bytes))
+        columns = {str(c).lower().strip(): c for c in df.columns}
+        ticker_col = next((columns[k] for k in _TICKER_HEADERS if k in columns), None)
+        shares_col = next((columns[k] for k in _SHARES_HEADERS if k in columns), None)
+        if ticker_col is None or shares_col is None:
+            return {}
+        tickers = df[ticker_col].astype(str).str.strip().str.upper()
+        shares = pd.to_numeric(df[shares_col], errors="coerce").fillna(100)
+        summed = shares.groupby(tickers).sum()
+        return {
+            _normalize_ticker(ticker): float(total)
+            for ticker, total in summed.items()
+            if _looks_like_ticker(_normalize_ticker(ticker))
+        }
+    except Exception as e:
+        logging.warning(f"Deterministic CSV parse failed, falling back to LLM: {e}")
+        return {}
+
+# Header synonyms shared by the deterministic CSV and Excel parsers
+_TICKER_HEADERS = ("ticker", "symbol", "stock")
+_SHARES_HEADERS = ("shares", "quantity", "position", "qty", "amount")
+
+def _parse_excel_holdings(file_bytes: bytes) -> Dict[str, float]:
+    """
+    Deterministic Excel path, mirroring _parse_csv_holdings: scan the first
+    few streamed rows of each sheet for labeled ticker/share columns and sum
+    holdings locally. Returns {} when no sheet has recognizable headers.
+    """
+    try:
+        import openpyxl
+        workbook = openpyxl.load_workbook(BytesIO(file_bytes), read_only=True, data_only=True)
+        holdings: Dict[str, float] = {}
+        try:
+            for worksheet in workbook.worksheets:
+                ticker_idx = shares_idx = None
+                for row in worksheet.iter_rows(values_only=True):
+                    if ticker_idx is None:
+                        headers = [str(value).lower().strip() if value is not None else "" for value in row]
+                        ticker_idx = next((i for i, h in enumerate(headers) if h in _TICKER_HEADERS), None)
+                        shares_idx = next((i for i, h in enumerate(headers) if h in _SHARES_HEADERS), None)
+                        if ticker_idx is None or shares_idx is None:
+                            ticker_idx = shares_idx = None
+                        continue
+                    if max(ticker_idx, shares_idx) >= len(row) or row[ticker_idx] is None:
+                        continue
+                    ticker = _normalize_ticker(str(row[ticker_idx]))
+                    if not _looks_like_ticker(ticker):
+                        continue
+                    try:
+                        shares = float(row[shares_idx]) if row[shares_idx] is not None else 100.0
+                    except (TypeError, ValueError):
+                        shares = 100.0
+                    holdings[ticker] = holdings.get(ticker, 0.0) + shares
+        finally:
+            workbook.close()
+        return holdings
+    except Exception as e:
+        logging.warning(f"Deterministic Excel parse failed, falling back to LLM: {e}")
+        return {}
+
+def _warm_openai_connection() -> None:
+    """
+    Open the TLS connection to OpenAI in the background so the first real
+    extraction call skips the handshake. Overlaps with document parsing.
+    """
+    try:
+        _openai_client().models.retrieve(OPENAI_MODEL)
+    except Exception as e:
+        logging.debug(f"OpenAI connection warmup failed: {e}")
+
 def process_single_file(file, file_type: str) -> Dict[str, float]:
     """Process a single file and return extracted holdings."""
     try:
+        # Rewind first: the widget's buffer survives reruns with its read
+        # pointer wherever the last run left it, so a bare read() on a
+        # re-click would return b"" and poison the content-hash caches
+        file.seek(0)
         file_bytes = file.read()
+
+        # Session-level memo: a rerun with the same upload (e.g. the user
+        # edits the email field and clicks Process again) skips extraction
+        file_hash = hashlib.sha256(file_bytes).hexdigest()
+        memo = st.session_state.setdefault('extraction_memo', {})
+        if file_hash in memo:
+            logging.info(f"Using session-cached extraction for {file.name}")
+            return memo[file_hash]
+
+        cached_holdings = _extraction_cache_get(file_bytes, file_type)
+        if cached_holdings is not None:
+            logging.info(f"Using cached extraction for {file.name}")
+            memo[file_hash] = cached_holdings
+            return cached_holdings
+
         content = ""
-        
+
         if file_type == 'pdf':
             content = extract_text_from_pdf(file_bytes)
         elif file_type == 'docx':
             content = extract_text_from_docx(file_bytes)
         elif file_type == 'csv':
-            df = pd.read_csv(BytesIO(file_bytes))
-            content = df.to_string()
+            # Labeled CSVs are parsed locally without any LLM round-trip
+            holdings = _parse_csv_holdings(file_bytes)
+            if holdings:
+                logging.info(f"Parsed {len(holdings)} holdings from {file.name} without the LLM")
+                memo[file_hash] = holdings
+                _extraction_cache_set(file_bytes, file_type, holdings)
+                return holdings
+            # The CSV already is text; a pandas parse just to re-render it as
+            # a string was pure overhead. _prompt_excerpt trims it for the LLM.
+            content = file_bytes.decode('utf-8', errors='replace')
         elif file_type in ['xlsx', 'xls']:
-            df = extract_data_from_excel(file_bytes)
-            content = df.to_string()
+            # Labeled workbooks are parsed locally without any LLM round-trip
+            holdings = _parse_excel_holdings(file_bytes)
+            if holdings:
+                logging.info(f"Parsed {len(holdings)} holdings from {file.name} without the LLM")
+                memo[file_hash] = holdings
+                _extraction_cache_set(file_bytes, file_type, holdings)
+                return holdings
+            content = extract_data_from_excel(file_bytes)
         
         if not content:
             logging.warning(f"No content extracted from {file.name}")
             return {}
         
         holdings = extract_portfolio_with_ai(content, file_type)
+        if holdings:
+            memo[file_hash] = holdings
+            _extraction_cache_set(file_bytes, file_type, holdings)
         return holdings
         
     except Exception as e:
@@ -334,29 +746,37 @@ def combine_holdings(holdings_list: List[Dict[str, float]]) -> Dict[str, float]:
     return combined
 
 # ---------- Streamlit UI ----------
-def main():
-    st.set_page_config(
-        page_title="Wall Street Weekly - Portfolio Management",
-        page_icon="💼",
-        layout="wide"
-    )
-
-    if 'google_sheet_initialized' not in st.session_state:
-        st.session_state['google_sheet_initialized'] = init_google_sheet()
+# Built once at import instead of re-assembled inside every rerun of main()
+_CONTACT_HTML = (
+    "<div style='display: flex; justify-content: center; margin-bottom: 2rem;'>"
+    "<button style='background: linear-gradient(135deg, #1a365d 0%, #2d3748 100%); "
+    "color: white; border: none; border-radius: 8px; padding: 0.75rem 2rem; "
+    "font-weight: 600; font-size: 1rem; cursor: pointer;' "
+    "onclick=\"window.location.href='mailto:keanejpalmer@gmail.com'\">"
+    "Contact Financial Advisor</button></div>"
+)
 
-    if not st.session_state['google_sheet_initialized']:
-        st.error("Failed to initialize database connection. Please check system configuration.")
-        return
+@contextmanager
+def _portfolio_display():
+    """Wrap a col2 branch in the portfolio-display card div."""
+    st.markdown('<div class="portfolio-display">', unsafe_allow_html=True)
+    try:
+        yield
+    finally:
+        st.markdown('</div>', unsafe_allow_html=True)
 
-    st.markdown("""
+@st.cache_resource
+def _page_css() -> str:
+    """Page stylesheet, built once per process instead of on every rerun."""
+    return """
     <style>
-    .main-header { 
-        text-align: center; 
-        padding: 3rem 0; 
-        background: linear-gradient(135deg, #1a365d 0%, #2d3748 100%); 
-        color: white; 
-        border-radius: 12px; 
-        margin-bottom: 2.5rem; 
+    .main-header {
+        text-align: center;
+        padding: 3rem 0;
+        background: linear-gradient(135deg, #1a365d 0%, #2d3748 100%);
+        color: white;
+        border-radius: 12px;
+        margin-bottom: 2.5rem;
         box-shadow: 0 8px 32px rgba(0,0,0,0.15);
         border: 1px solid rgba(255,255,255,0.1);
     }
@@ -391,12 +811,69 @@ def main():
         padding-bottom: 0.5rem;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def main():
+    st.set_page_config(
+        page_title="Wall Street Weekly - Portfolio Management",
+        page_icon="💼",
+        layout="wide"
+    )
+
+    if not _sheet_ready():
+        # Drop the cached failure so a transient handshake error does not
+        # pin every session to this message until the process restarts
+        _sheet_ready.clear()
+        st.error("Failed to initialize database connection. Please check system configuration.")
+        return
+
+    # Surface the outcome of a background portfolio save from a prior rerun
+    pending_save = st.session_state.get('pending_save')
+    if pending_save is not None and pending_save.done():
+        del st.session_state['pending_save']
+        try:
+            save_ok = pending_save.result()
+        except Exception as e:
+            logging.error(f"Background portfolio save failed: {e}", exc_info=True)
+            save_ok = False
+        if not save_ok:
+            st.error("Saving your portfolio to the database failed. Please process your files again.")
+
+    st.markdown(_page_css(), unsafe_allow_html=True)
 
     st.markdown('<div class="main-header"><h1>Wall Street Weekly</h1><h3>Professional Portfolio Management System</h3></div>', unsafe_allow_html=True)
 
+    # Admin controls
+    with st.sidebar:
+        st.markdown("### Admin")
+        if st.button("Send All Newsletters", key="send_all_newsletters"):
+            from main import generate_newsletter_for_user
+            users = [u for u in _all_users() if u.get('holdings')]
+            if not users:
+                st.warning("No subscribers with saved portfolios found.")
+            else:
+                progress_bar = st.progress(0)
+                success_count = 0
+                with st.spinner(f"Sending newsletters to {len(users)} subscribers..."):
+                    # Each send is I/O-bound (market data + OpenAI + SMTP), so
+                    # overlapping them collapses wall time to roughly one send
+                    with ThreadPoolExecutor(max_workers=min(16, len(users))) as executor:
+                        futures = {
+                            executor.submit(generate_newsletter_for_user, u['email'], u['holdings']): u
+                            for u in users
+                        }
+                        for i, future in enumerate(as_completed(futures)):
+                            user = futures[future]
+                            try:
+                                if future.result():
+                                    success_count += 1
+                            except Exception as e:
+                                logging.error(f"Newsletter failed for {user['email']}: {e}")
+                            progress_bar.progress((i + 1) / len(futures))
+                st.success(f"Sent {success_count}/{len(users)} newsletters")
+
     # Contact Advisor button at the top (centered)
-    st.markdown("<div style='display: flex; justify-content: center; margin-bottom: 2rem;'><button style='background: linear-gradient(135deg, #1a365d 0%, #2d3748 100%); color: white; border: none; border-radius: 8px; padding: 0.75rem 2rem; font-weight: 600; font-size: 1rem; cursor: pointer;' onclick=\"window.location.href='mailto:keanejpalmer@gmail.com'\">Contact Financial Advisor</button></div>", unsafe_allow_html=True)
+    st.markdown(_CONTACT_HTML, unsafe_allow_html=True)
 
     st.markdown("---")
 
@@ -445,7 +922,10 @@ def main():
                 
                 update_progress(current_step, total_steps, "Initializing file processing...")
                 current_step += 1
-                
+
+                # Warm the OpenAI connection while the first file extracts
+                threading.Thread(target=_warm_openai_connection, daemon=True).start()
+
                 all_holdings = []
                 file_results = []
                 
@@ -498,20 +978,37 @@ def main():
                 update_progress(current_step, total_steps, "Saving portfolio to database...")
                 st.info("Saving combined portfolio data to database...")
                 
-                if save_user_portfolio_to_sheets(email, combined_holdings):
+                # The Sheets write can take seconds under load; run it in the
+                # background and only wait briefly before going optimistic.
+                # The rerun check at the top of main() surfaces late failures.
+                # The quote prefetch overlaps the save so the first Load
+                # Current Prices click after the rerun hits a warm cache.
+                def _prefetch_quotes(tickers=tuple(sorted(combined_holdings))):
+                    from alpha_vantage_service import get_alpha_vantage_service
+                    get_alpha_vantage_service().get_current_prices(tickers)
+
+                threading.Thread(target=_prefetch_quotes, daemon=True).start()
+                save_future = _save_executor().submit(save_user_portfolio_to_sheets, email, combined_holdings)
+                try:
+                    saved = save_future.result(timeout=1)
+                except FuturesTimeoutError:
+                    saved = None
+                    st.session_state['pending_save'] = save_future
+                if saved is False:
+                    st.error("Failed to save portfolio to database.")
+                    st.error("Please check the terminal logs for detailed error information.")
+                else:
+                    _all_users.clear()  # The subscriber list just changed
                     update_progress(current_step, total_steps, "Portfolio processing complete!")
                     st.success("Portfolio saved successfully!")
                     st.session_state['current_holdings'] = combined_holdings
                     st.session_state['current_email'] = email
                     st.session_state['file_results'] = file_results
-                    st.success("All files processed and portfolio saved successfully!")
                     st.info("You can now view your combined portfolio on the right side and send a test newsletter.")
-                    import time
-                    time.sleep(2)
+                    # Auto-dismissing toast instead of a blocking sleep; the
+                    # rerun repaints col2 with the freshly saved holdings
+                    st.toast("Portfolio saved!", icon="✅")
                     st.rerun()
-                else:
-                    st.error("Failed to save portfolio to database.")
-                    st.error("Please check the terminal logs for detailed error information.")
                     
             except Exception as e:
                 st.error(f"An error occurred during processing: {str(e)}")
@@ -526,63 +1023,47 @@ def main():
             email = st.session_state.get('current_email', '')
             file_results = st.session_state.get('file_results', [])
             
-            st.markdown('<div class="portfolio-display">', unsafe_allow_html=True)
-            st.subheader(f"Combined Portfolio for: {email}")
-            
-            # Show file processing summary
-            if file_results:
-                st.markdown("**File Processing Summary:**")
-                for result in file_results:
-                    if result['status'] == 'success':
-                        st.success(f"✓ {result['file']}: {len(result['holdings'])} holdings")
-                    else:
-                        st.warning(f"⚠ {result['file']}: No holdings found")
-                st.markdown("---")
-            
-            ticker_list = tuple(holdings.keys())
-            if ticker_list:
-                portfolio_data = []
-                for ticker, shares in holdings.items():
-                    portfolio_data.append({'Ticker': ticker, 'Shares': shares})
-                df = pd.DataFrame(portfolio_data)
-                st.dataframe(df, use_container_width=True)
-                if st.button("Load Current Prices", use_container_width=True, key="load_prices"):
-                    with st.spinner("Fetching current prices..."):
-                        portfolio_details = get_batch_stock_data(ticker_list)
-                        portfolio_data_with_prices = []
-                        total_value = 0
-                        for ticker, shares in holdings.items():
-                            details = portfolio_details.get(ticker)
-                            if details and details.get('current_price') is not None:
-                                current_price = details.get('current_price', 0)
-                                value = current_price * shares
-                                total_value += value
-                                portfolio_data_with_prices.append({
-                                    'Ticker': ticker,
-                                    'Company': details.get('company_name', ticker),
-                                    'Shares': shares,
-                                    'Current Price': f"${current_price:.2f}",
-                                    'Value': f"${value:,.2f}"
-                                })
-                        if portfolio_data_with_prices:
-                            df_with_prices = pd.DataFrame(portfolio_data_with_prices)
-                            st.dataframe(df_with_prices, use_container_width=True)
-                            st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-                            st.metric("Total Portfolio Value", f"${total_value:,.2f}")
-                            st.markdown('</div>', unsafe_allow_html=True)
+            with _portfolio_display():
+                st.subheader(f"Combined Portfolio for: {email}")
+
+                # Show file processing summary
+                if file_results:
+                    st.markdown("**File Processing Summary:**")
+                    for result in file_results:
+                        if result['status'] == 'success':
+                            st.success(f"✓ {result['file']}: {len(result['holdings'])} holdings")
                         else:
-                            st.warning("Could not fetch current prices for any holdings")
-            if st.button("Send Test Newsletter", use_container_width=True, key="send_test_newsletter"):
-                with st.spinner(f"Generating and sending newsletter to {email}..."):
-                    if generate_newsletter_for_user(email, holdings):
-                        st.success(f"Newsletter sent to {email}!")
-                    else:
-                        st.error("Failed to send newsletter. Check logs for details.")
-            st.markdown('</div>', unsafe_allow_html=True)
+                            st.warning(f"⚠ {result['file']}: No holdings found")
+                    st.markdown("---")
+
+                ticker_list = tuple(holdings.keys())
+                if ticker_list:
+                    df = pd.DataFrame({'Ticker': list(holdings.keys()), 'Shares': list(holdings.values())})
+                    st.dataframe(df, use_container_width=True)
+                    if st.button("Load Current Prices", use_container_width=True, key="load_prices"):
+                        with st.spinner("Fetching current prices..."):
+                            # Sorted tuple keeps the cache key stable across reruns
+                            df_with_prices, total_value = _build_portfolio_df(tuple(sorted(holdings.items())))
+                            if len(df_with_prices):
+                                st.dataframe(
+                                    df_with_prices.style.format({'Current Price': '${:.2f}', 'Value': '${:,.2f}'}),
+                                    use_container_width=True
+                                )
+                                st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+                                st.metric("Total Portfolio Value", f"${total_value:,.2f}")
+                                st.markdown('</div>', unsafe_allow_html=True)
+                            else:
+                                st.warning("Could not fetch current prices for any holdings")
+                if st.button("Send Test Newsletter", use_container_width=True, key="send_test_newsletter"):
+                    from main import generate_newsletter_for_user
+                    with st.spinner(f"Generating and sending newsletter to {email}..."):
+                        if generate_newsletter_for_user(email, holdings):
+                            st.success(f"Newsletter sent to {email}!")
+                        else:
+                            st.error("Failed to send newsletter. Check logs for details.")
         else:
-            st.markdown('<div class="portfolio-display">', unsafe_allow_html=True)
-            st.info("Upload portfolio files to see your holdings and send newsletters")
-            st.markdown('</div>', unsafe_allow_html=True)
+            with _portfolio_display():
+                st.info("Upload portfolio files to see your holdings and send newsletters")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -24,7 +24,7 @@ TICKERS_STANDALONE_TEST = [
 # Initialize OpenAI client
 client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
+@st.cache_data(ttl=300)  # Match the app-side quote cache so stale prices cannot outlive it
 def get_batch_stock_data(tickers: Tuple[str, ...]) -> Dict[str, Dict[str, Any]]:
     """
     Fetch current stock prices using Alpha Vantage API directly.
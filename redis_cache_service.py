@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Redis Cache Service - Shared price/historical cache for Alpha Vantage data
+
+Keeps cached quotes in Redis so they survive Streamlit restarts and are
+shared across sessions/replicas. Falls back to a plain in-process dict
+when REDIS_URL is not configured (or the redis package is unavailable),
+so local development needs no extra infrastructure.
+"""
+
+import logging
+import os
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+import orjson
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# ---------- LOGGING ----------
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s  %(levelname)-8s  %(message)s",
+    datefmt="%H:%M:%S",
+)
+
+# Tiered TTLs: current prices go stale quickly, historical windows do not
+PRICE_TTL = 300  # 5 minutes
+HIST_TTL = 86400  # 24 hours
+SERIES_TTL = 21600  # 6 hours - a full-length series answers every window locally
+
+# Serialized payload format: 1-byte version prefix + zlib(orjson bytes).
+# Level-1 zlib shrinks full series payloads 5-10x for negligible CPU, and
+# the prefix lets the format evolve without flushing the cache.
+_PAYLOAD_VERSION = b"\x01"
+
+
+def _pack(obj: Any) -> bytes:
+    return _PAYLOAD_VERSION + zlib.compress(orjson.dumps(obj), 1)
+
+
+def _unpack(blob: bytes) -> Optional[Any]:
+    if not blob or blob[:1] != _PAYLOAD_VERSION:
+        return None
+    return orjson.loads(zlib.decompress(blob[1:]))
+
+
+class RedisCacheService:
+    """
+    Write-through cache for current prices and historical performance data.
+    Keys follow av:price:{TICKER} and av:hist:{TICKER}:{start}:{end}.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._memory: Dict[str, Any] = {}  # key -> (expiry_time, value)
+
+        redis_url = os.environ.get("REDIS_URL")
+        if redis_url and redis is not None:
+            try:
+                # Raw bytes responses - hist/series values are compressed blobs
+                self._client = redis.Redis.from_url(redis_url)
+                self._client.ping()
+                logging.info("Redis cache connected")
+            except Exception as e:
+                logging.warning(f"Redis unavailable ({e}), falling back to in-memory cache")
+                self._client = None
+        else:
+            logging.info("REDIS_URL not set, using in-memory cache")
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expiry_time, value = entry
+        if time.time() >= expiry_time:
+            del self._memory[key]
+            return None
+        return value
+
+    def _memory_set(self, key: str, value: Any, ttl: int) -> None:
+        self._memory[key] = (time.time() + ttl, value)
+
+    def get_rate(self, ticker: str) -> Optional[float]:
+        """Get a cached current price, or None on miss."""
+        key = f"av:price:{ticker.upper()}"
+        if self._client is not None:
+            try:
+                value = self._client.get(key)
+                return float(value) if value is not None else None
+            except Exception as e:
+                logging.error(f"Redis GET failed for {key}: {e}")
+                return None
+        return self._memory_get(key)
+
+    def set_rate(self, ticker: str, price: float) -> None:
+        """Cache a current price with the short price TTL."""
+        key = f"av:price:{ticker.upper()}"
+        if self._client is not None:
+            try:
+                self._client.setex(key, PRICE_TTL, price)
+                return
+            except Exception as e:
+                logging.error(f"Redis SETEX failed for {key}: {e}")
+                return
+        self._memory_set(key, price, PRICE_TTL)
+
+    def get_hist(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached historical result dict, or None on miss."""
+        full_key = f"av:hist:{key}"
+        if self._client is not None:
+            try:
+                value = self._client.get(full_key)
+                return _unpack(value) if value is not None else None
+            except Exception as e:
+                logging.error(f"Redis GET failed for {full_key}: {e}")
+                return None
+        return self._memory_get(full_key)
+
+    def get_series(self, ticker: str) -> Optional[Dict[str, float]]:
+        """Get a cached daily-close series ({date: close}), or None on miss."""
+        key = f"av:series:{ticker.upper()}"
+        if self._client is not None:
+            try:
+                value = self._client.get(key)
+                return _unpack(value) if value is not None else None
+            except Exception as e:
+                logging.error(f"Redis GET failed for {key}: {e}")
+                return None
+        return self._memory_get(key)
+
+    def set_series(self, ticker: str, closes: Dict[str, float]) -> None:
+        """Cache a daily-close series so range lookups skip the API entirely."""
+        key = f"av:series:{ticker.upper()}"
+        if self._client is not None:
+            try:
+                self._client.setex(key, SERIES_TTL, _pack(closes))
+                return
+            except Exception as e:
+                logging.error(f"Redis SETEX failed for {key}: {e}")
+                return
+        self._memory_set(key, closes, SERIES_TTL)
+
+    def set_hist(self, key: str, obj: Dict[str, Any]) -> None:
+        """Cache a historical result dict with the long historical TTL."""
+        full_key = f"av:hist:{key}"
+        if self._client is not None:
+            try:
+                self._client.setex(full_key, HIST_TTL, _pack(obj))
+                return
+            except Exception as e:
+                logging.error(f"Redis SETEX failed for {full_key}: {e}")
+                return
+        self._memory_set(full_key, obj, HIST_TTL)
+
+
+def get_redis_cache_service() -> RedisCacheService:
+    """
+    Get or create a RedisCacheService instance.
+    """
+    if not hasattr(get_redis_cache_service, '_instance'):
+        get_redis_cache_service._instance = RedisCacheService()
+    return get_redis_cache_service._instance